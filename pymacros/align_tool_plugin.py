@@ -20,6 +20,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+import math
 import os 
 import sys
 from typing import *
@@ -38,6 +39,11 @@ class AlignToolState(StrEnum):
     PENDING_SELECTION2 = "pending_selection2"
 
 
+class AlignToolSearchMode(StrEnum):
+    SOURCE = "source"  # feature of the object to be aligned
+    TARGET = "target"  # reference feature to align to
+
+
 @dataclass
 class AlignToolSelection:
     location: pya.Point
@@ -58,6 +64,104 @@ class AlignToolSelection:
                f")"
 
 
+def snap_to_grid(v: int, grid: int) -> int:
+    """
+    Integer-only rounding of v to the nearest multiple of grid (halfway cases away from zero)
+    """
+    half = grid >> 1
+    if v >= 0:
+        return (v + half) // grid * grid
+    else:
+        return -((half - v) // grid * grid)
+
+
+def align_along_x(source: pya.Point, target: pya.Point) -> Tuple[int, int]:
+    return target.x - source.x, 0
+
+
+def align_along_y(source: pya.Point, target: pya.Point) -> Tuple[int, int]:
+    return 0, target.y - source.y
+
+
+def align_none(source: pya.Point, target: pya.Point) -> Tuple[int, int]:
+    return 0, 0
+
+
+# alignment to an edge moves only in direction normal to the edge,
+# keyed by (is_vertical, is_horizontal), other (diagonal) edges don't move
+EDGE_ALIGN_HANDLERS: Dict[Tuple[bool, bool], Callable[[pya.Point, pya.Point], Tuple[int, int]]] = {
+    (True, False): align_along_x,  # vertical edge
+    (False, True): align_along_y,  # horizontal edge
+    (True, True): align_along_y,   # degenerated edge
+}
+
+
+def edge_align_handler(edge: pya.Edge) -> Callable[[pya.Point, pya.Point], Tuple[int, int]]:
+    return EDGE_ALIGN_HANDLERS.get((edge.dx() == 0, edge.dy() == 0), align_none)
+
+
+class AlignToolPreviewMarkers:
+    """
+    Preview markers of a selection (edge, snap point, search box).
+    
+    The markers are created once and reused between mouse move events,
+    only their geometry is updated.
+    """
+    def __init__(self, view: pya.LayoutView):
+        self.view = view
+        self.edge_marker: Optional[pya.Marker] = None
+        self.point_marker: Optional[pya.Marker] = None
+        self.search_box_marker: Optional[pya.Marker] = None
+    
+    def update(self, 
+               selection: AlignToolSelection, 
+               dbu: float, 
+               point_marker_size: int, 
+               search_box_marker_visible: bool):
+        if self.edge_marker is None:
+            self.edge_marker = pya.Marker(self.view)
+            self.edge_marker.line_style     = 0
+            self.edge_marker.line_width     = 2
+            self.edge_marker.vertex_size    = 0 
+            self.edge_marker.dither_pattern = 2
+        self.edge_marker.set(selection.edge.to_dtype(dbu))
+        
+        if selection.snap_point is not None:
+            if self.point_marker is None:
+                self.point_marker = pya.Marker(self.view)
+                self.point_marker.line_style     = 1
+                self.point_marker.line_width     = 2
+                self.point_marker.vertex_size    = 0
+                self.point_marker.dither_pattern = 0
+            d = point_marker_size
+            marker_box = pya.Box(pya.Point(selection.snap_point.x - d, selection.snap_point.y - d), 
+                                 pya.Point(selection.snap_point.x + d, selection.snap_point.y + d))
+            self.point_marker.set(marker_box.to_dtype(dbu))
+        elif self.point_marker is not None:
+            self.point_marker._destroy()
+            self.point_marker = None
+        
+        if search_box_marker_visible:
+            if self.search_box_marker is None:
+                self.search_box_marker = pya.Marker(self.view)
+                self.search_box_marker.line_style = 2
+                self.search_box_marker.line_width = 1
+                self.search_box_marker.vertex_size = 0
+                self.search_box_marker.dither_pattern = -1
+            self.search_box_marker.set(selection.search_box.to_dtype(dbu))
+        elif self.search_box_marker is not None:
+            self.search_box_marker._destroy()
+            self.search_box_marker = None
+
+    def clear(self):
+        for marker in (self.edge_marker, self.point_marker, self.search_box_marker):
+            if marker is not None:
+                marker._destroy()
+        self.edge_marker = None
+        self.point_marker = None
+        self.search_box_marker = None
+
+
 class AlignToolSetupDock(pya.QDockWidget):
     def __init__(self):
         super().__init__()
@@ -103,16 +207,16 @@ class AlignToolSetupWidget(pya.QWidget):
         event.accept()
     
     def updateState(self, state: AlignToolState):
-        if state == AlignToolState.INACTIVE:
+        if state is AlignToolState.INACTIVE:
             self.selection1_status_label.setText("")
             self.selection2_status_label.setText("")
-        elif state == AlignToolState.PENDING_SELECTION1:
+        elif state is AlignToolState.PENDING_SELECTION1:
             self.selection1_status_label.setText(
                 '<span style="color:blue; font-weight:bold;">⬅</span> '
                 '<span style="font-weight:bold; color:blue;">Next</span>'
             )
             self.selection2_status_label.setText("")
-        elif state == AlignToolState.PENDING_SELECTION2:
+        elif state is AlignToolState.PENDING_SELECTION2:
             self.selection1_status_label.setText("✅")
             self.selection2_status_label.setText(
                 '<span style="color:blue; font-weight:bold;">⬅</span> '
@@ -162,15 +266,32 @@ class AlignToolPlugin(pya.Plugin):
         super().__init__()
         self.setupDock      = None
         self.view            = view
+        self._widget         = view.widget()  # NOTE: cached, avoids repeated binding calls
 
         self._state = AlignToolState.INACTIVE
+        self._search_mode: Optional[AlignToolSearchMode] = None
         self._pre_selected_objects = []
         self._selection1: Optional[AlignToolSelection] = None
-        self.markers_selection1 = []
-        self.markers_selection2 = []
+        self.markers_selection1 = AlignToolPreviewMarkers(view)
+        self.markers_selection2 = AlignToolPreviewMarkers(view)
         self.preview_selection1: Optional[AlignToolSelection] = None
         self.preview_selection2: Optional[AlignToolSelection] = None
         self.toolTip = pya.QToolTip()
+        self._last_tooltip_state: Optional[Tuple[AlignToolSearchMode, bool]] = None  # (mode, hit)
+        
+        # NOTE: consecutive mouse moves within one frame result in a single marker update
+        self._pending_preview_markers: Optional[AlignToolPreviewMarkers] = None
+        self._preview_markers_timer = pya.QTimer()
+        self._preview_markers_timer.setSingleShot(True)
+        self._preview_markers_timer.setInterval(8)
+        self._preview_markers_timer.timeout += self._update_pending_preview_markers
+        
+        # NOTE: view dependent state, which does not change between mouse move events,
+        #       is cached while the tool is active, and invalidated by the view events
+        self._view_events_connected = False
+        self._cached_dbu: Optional[float] = None
+        self._cached_grid_dbu: Optional[int] = None
+        self._cached_visible_layer_indexes: Optional[List[int]] = None
 
     @property
     def cell_view(self) -> pya.CellView:
@@ -182,7 +303,45 @@ class AlignToolPlugin(pya.Plugin):
         
     @property
     def dbu(self) -> float:
-        return self.layout.dbu
+        if self._cached_dbu is None:
+            self._cached_dbu = self.layout.dbu
+        return self._cached_dbu
+    
+    @property
+    def grid_dbu(self) -> int:
+        """
+        Technical minimum grid in database units
+        """
+        if self._cached_grid_dbu is None:
+            self._cached_grid_dbu = int(drc_tech_grid_um() / self.dbu)
+        return self._cached_grid_dbu
+    
+    def _invalidate_view_cache(self, *args):
+        if Debugging.DEBUG:
+            debug("AlignToolPlugin._invalidate_view_cache")
+        self._cached_dbu = None
+        self._cached_grid_dbu = None
+        self._cached_visible_layer_indexes = None
+
+    def _connect_view_events(self):
+        if self._view_events_connected:
+            return
+        self.view.on_layer_list_changed += self._invalidate_view_cache
+        self.view.on_active_cellview_changed += self._invalidate_view_cache
+        self.view.on_cellview_changed += self._invalidate_view_cache
+        self.view.on_cellviews_changed += self._invalidate_view_cache
+        self.view.on_apply_technology += self._invalidate_view_cache
+        self._view_events_connected = True
+
+    def _disconnect_view_events(self):
+        if not self._view_events_connected:
+            return
+        self.view.on_layer_list_changed -= self._invalidate_view_cache
+        self.view.on_active_cellview_changed -= self._invalidate_view_cache
+        self.view.on_cellview_changed -= self._invalidate_view_cache
+        self.view.on_cellviews_changed -= self._invalidate_view_cache
+        self.view.on_apply_technology -= self._invalidate_view_cache
+        self._view_events_connected = False
 
     @property
     def state(self) -> AlignToolState:
@@ -193,6 +352,18 @@ class AlignToolPlugin(pya.Plugin):
         if Debugging.DEBUG:
             debug(f"Transitioning from {self._state.value} to {state.value}")
         self._state = state
+        self._last_tooltip_state = None
+        
+        # NOTE: the search mode is invariant while in a state,
+        #       so it's chosen once here, instead of on each mouse move event
+        if state is AlignToolState.INACTIVE:
+            self._search_mode = None
+        elif state is AlignToolState.PENDING_SELECTION1:
+            self._search_mode = AlignToolSearchMode.SOURCE
+        elif state is AlignToolState.PENDING_SELECTION2:
+            self._search_mode = AlignToolSearchMode.TARGET
+        else:
+            raise NotImplementedError(f"AlignToolState.matches: unknown type {state}")
         if not(self.setupDock):
             pass
         else:
@@ -251,7 +422,7 @@ class AlignToolPlugin(pya.Plugin):
         return l
         
     def activated(self):
-        view_is_visible = self.view.widget().isVisible()
+        view_is_visible = self._widget.isVisible()
         if Debugging.DEBUG:
             debug(f"AlignToolPlugin.activated, "
                   f"for cell view {self.cell_view.cell_name}, "
@@ -266,6 +437,9 @@ class AlignToolPlugin(pya.Plugin):
             mw.addDockWidget(pya.Qt_DockWidgetArea.RightDockWidgetArea, self.setupDock)
         self.setupDock.show()
 
+        self._invalidate_view_cache()
+        self._connect_view_events()
+
         self.pre_selected_objects = self.selected_objects()
         
         self.state = AlignToolState.PENDING_SELECTION1
@@ -277,8 +451,11 @@ class AlignToolPlugin(pya.Plugin):
         self.state = AlignToolState.INACTIVE
         self.pre_selected_objects = []
         
+        self._preview_markers_timer.stop()
         self._clear_all_markers()
         self.ungrab_mouse()
+        self._disconnect_view_events()
+        self._invalidate_view_cache()
         if self.setupDock:
             self.setupDock.hide()
 
@@ -287,50 +464,72 @@ class AlignToolPlugin(pya.Plugin):
             debug("AlignToolPlugin.deactive")
         esc_key  = 16777216 
         keyPress = pya.QKeyEvent(pya.QKeyEvent.KeyPress, esc_key, pya.Qt.NoModifier)
-        pya.QApplication.sendEvent(self.view.widget(), keyPress)        
+        pya.QApplication.sendEvent(self._widget, keyPress)        
 
     def _clear_all_markers(self):
         self._clear_markers_selection1()
         self._clear_markers_selection2()
         
     def _clear_markers_selection1(self):
-        for marker in self.markers_selection1:
-            marker._destroy()
-        self.markers_selection1 = []
+        if self._pending_preview_markers is self.markers_selection1:
+            self._pending_preview_markers = None
+        self.markers_selection1.clear()
         self.preview_selection1 = None
 
     def _clear_markers_selection2(self):
-        for marker in self.markers_selection2:
-            marker._destroy()
-        self.markers_selection2 = []
+        if self._pending_preview_markers is self.markers_selection2:
+            self._pending_preview_markers = None
+        self.markers_selection2.clear()
         self.preview_selection2 = None
+    
+    def _schedule_preview_markers_update(self, markers: AlignToolPreviewMarkers):
+        if self._pending_preview_markers is not None and self._pending_preview_markers is not markers:
+            self._update_pending_preview_markers()
+        self._pending_preview_markers = markers
+        if not self._preview_markers_timer.isActive():
+            self._preview_markers_timer.start()
+    
+    def _update_pending_preview_markers(self):
+        markers = self._pending_preview_markers
+        self._pending_preview_markers = None
+        if markers is self.markers_selection1:
+            selection = self.preview_selection1
+        elif markers is self.markers_selection2:
+            selection = self.preview_selection2
+        else:
+            return
+        if selection is None:
+            return
+        markers.update(selection=selection,
+                       dbu=self.dbu,
+                       point_marker_size=self.viewport_adjust(5),
+                       search_box_marker_visible=self.search_box_marker_visible)
 
     def find_nearest_edge_point(self, location: pya.Point, edge: pya.Edge) -> pya.Point:
         """
         On the chosen edge, we want to find nearest end point or the center point
         """
-
-        def halfway(a: int, b:int) -> int:
-            if a < b:
-                return a + (b - a) / 2
-            else:
-                return b + (a - b) / 2
-
-        nearest_point = None
-        nearest_distance = 9999999999
         
-        edge_center = pya.Point(halfway(edge.x1, edge.x2), halfway(edge.y1, edge.y2))
-        points = [edge_center, edge.p1, edge.p2]
-        distances = [abs(p.distance(location)) for p in points]
+        # NOTE: integer midpoint and squared distances, no need for sqrt
+        px, py = location.x, location.y
+        x1, y1, x2, y2 = edge.x1, edge.y1, edge.x2, edge.y2
+        cx = (x1 + x2) >> 1
+        cy = (y1 + y2) >> 1
         
-        for point, distance in zip(points, distances):
-            if distance < nearest_distance:
-                nearest_distance = distance
-                nearest_point = point  
+        nearest_xy = None
+        nearest_dist2 = math.inf
+        for x, y in ((cx, cy), (x1, y1), (x2, y2)):
+            dist2 = (x - px) * (x - px) + (y - py) * (y - py)
+            if dist2 < nearest_dist2:
+                nearest_dist2 = dist2
+                nearest_xy = (x, y)
         
-        return nearest_point
+        return pya.Point(*nearest_xy)
     
     def visible_layer_indexes(self) -> List[int]:
+        if self._cached_visible_layer_indexes is not None:
+            return self._cached_visible_layer_indexes
+        
         idxs = []
         for lref in self.view.each_layer():
             if lref.visible and lref.valid:
@@ -340,196 +539,285 @@ class AlignToolPlugin(pya.Plugin):
                 #       f"marked={lref.marked} cellview={lref.cellview()}, "
                 #      f"source={lref.source}")
                 idxs.append(lref.layer_index())
+        self._cached_visible_layer_indexes = idxs
         return idxs
     
-    def find_selection(self, location: pya.DPoint, max_distance: int, consider_rulers: bool) -> Optional[AlignToolSelection]:
-        location = location.to_itype(self.dbu)
+    def find_selection(self, location: pya.DPoint, max_distance: int, mode: AlignToolSearchMode) -> Optional[AlignToolSelection]:
+        view = self.view
+        cell_view = self.cell_view
+        dbu = self.dbu
+        min_hier_levels = view.min_hier_levels
+        max_hier_levels = view.max_hier_levels
+        
+        # only consider rulers to specify a destination
+        consider_rulers = mode is AlignToolSearchMode.TARGET
+        
+        # NOTE: with GUI levels 0 .. 0, there are no instances or shapes to search for,
+        #       so unless rulers are considered, there is nothing to find
+        walk_layout = max_hier_levels >= 1
+        if not walk_layout and not consider_rulers:
+            return None
+        
+        location = location.to_itype(dbu)
                 
         search_box = pya.Box(location.x - max_distance, location.y - max_distance, 
                              location.x + max_distance, location.y + max_distance)
 
-        nearest = AlignToolSelection(location=location,
-                                     search_box=search_box,
-                                     edge=None,
-                                     path=[],    
-                                     shape=None,
-                                     bbox_of_instance=None,
-                                     layer=None,
-                                     snap_point=None)
-        
-        def consider_edge_selection(selection: AlignToolSelection):
-            nonlocal nearest, search_box, location
-            intersection = selection.edge.clipped(search_box)
-            if intersection is None:
+        # NOTE: this is a hotspot, called for each mouse move event.
+        #       Candidates are rejected using integer arithmetic on the edge coordinates,
+        #       the edge (if not given) is only created if a candidate becomes the nearest one,
+        #       the selection object is only created once for the final nearest candidate
+        box_left, box_bottom = search_box.left, search_box.bottom
+        box_right, box_top = search_box.right, search_box.top
+        px, py = location.x, location.y
+        
+        # (edge, path, shape, bbox_of_instance, layer, snap_point)
+        nearest: Optional[Tuple[pya.Edge, List[pya.InstElement], Optional[pya.Shape], 
+                                Optional[pya.Instance], Optional[int], Optional[pya.Point]]] = None
+        nearest_dist2 = math.inf  # squared distance of the nearest edge
+        
+        def consider_edge_selection(x1: int, y1: int, x2: int, y2: int,
+                                    edge: Optional[pya.Edge],
+                                    path: List[pya.InstElement],
+                                    shape: Optional[pya.Shape],
+                                    bbox_of_instance: Optional[pya.Instance],
+                                    layer: Optional[int],
+                                    snap_point: Optional[pya.Point]):
+            nonlocal nearest, nearest_dist2
+            # NOTE: plain comparisons instead of min()/max() builtin calls
+            if x1 <= x2:
+                if x2 < box_left or x1 > box_right:
+                    return
+            elif x1 < box_left or x2 > box_right:
                 return
-            elif nearest.edge is None:
-                nearest = selection
-            else:
-                old_intersection = nearest.edge.clipped(search_box)
-                dist_old = old_intersection.distance_abs(location)
-                dist_new = intersection.distance_abs(location)
-                if dist_new < dist_old:
-                    nearest = selection
-                # # Hotspot, don't log this
-                # else:
-                #    if Debugging.DEBUG:                
-                #        debug(f"dist_old({dist_old}) >= dist_new({dist_new}), old edge {nearest.edge} not replaced by {selection.edge}, "
-                #              f"intersections old {old_intersection} vs new {intersection}")
+            if y1 <= y2:
+                if y2 < box_bottom or y1 > box_top:
+                    return
+            elif y1 < box_bottom or y2 > box_top:
+                return
+            
+            dx = x2 - x1
+            dy = y2 - y1
+            if dx == 0 and dy == 0:  # degenerated edge (point)
+                # NOTE: like pya.Edge.distance_abs, which is 0 for degenerated edges,
+                #       so midpoints and ruler points within the search box take precedence
+                dist2 = 0
+            elif dy == 0:  # horizontal edge
+                dist2 = (py - y1) * (py - y1)
+            elif dx == 0:  # vertical edge
+                dist2 = (px - x1) * (px - x1)
+            else:  # distance to the line through the edge
+                cross = dx * (py - y1) - dy * (px - x1)
+                dist2 = cross * cross / (dx * dx + dy * dy)
+                
+            if dist2 >= nearest_dist2:
+                return
+            
+            if edge is None:
+                edge = pya.Edge(x1, y1, x2, y2)
+            
+            # NOTE: for diagonal edges, the bounding box test is not sufficient
+            if dx != 0 and dy != 0 and edge.clipped(search_box) is None:
+                return
+            
+            nearest_dist2 = dist2
+            nearest = (edge, path, shape, bbox_of_instance, layer, snap_point)
         
-        visible_layer_indexes = self.visible_layer_indexes()
+        def consider_box_edge_selections(box: pya.Box,
+                                         path: List[pya.InstElement],
+                                         shape: Optional[pya.Box],
+                                         bbox_of_instance: Optional[pya.Instance]):
+            # NOTE: the edges of a box are known, no need to iterate over pya.Edges(box)
+            l, b, r, t = box.left, box.bottom, box.right, box.top
+            if r < box_left or l > box_right or t < box_bottom or b > box_top:
+                return
+            for x1, y1, x2, y2 in ((l, b, l, t), (l, t, r, t), (r, t, r, b), (r, b, l, b)):
+                consider_edge_selection(x1, y1, x2, y2,
+                                        edge=None,
+                                        path=path,
+                                        shape=shape,
+                                        bbox_of_instance=bbox_of_instance,
+                                        layer=None,
+                                        snap_point=None)  # NOTE: snap point will be set later
         
         # NOTE: self.layout.top_cells() are the top cells from the layout perspective,
         #       but self.cell_view.cell is the current top cell,  
         #       which is user-configurable via 'Show As New Top'
         
-        top_cell = self.cell_view.cell
-        if self.cell_view.is_cell_hidden(top_cell):
+        top_cell = cell_view.cell
+        if cell_view.is_cell_hidden(top_cell):
             return None
         
         iteration_limit = 1000
+        
+        # NOTE: for polygons with many edges, the search box rejection is done in bulk
+        #       by KLayout (Edges.interacting), instead of testing each edge in Python
+        bulk_reject_min_points = 32
+        search_region: Optional[pya.Region] = None
 
         #
         # consider bounding box and center for instances where only the cell frame is visible
         # do not consider visible instances (where the cell frame is also not displayed)
         #
-        if self.view.max_hier_levels >= 1:
+        if walk_layout:
+            active_cellview_index = view.active_cellview_index
             iter = top_cell.begin_instances_rec_overlapping(search_box)
-            iter.min_depth = max(self.view.max_hier_levels-1, 0)
-            iter.max_depth = max(self.view.max_hier_levels-1, 0)
+            iter.min_depth = max(max_hier_levels-1, 0)
+            iter.max_depth = max(max_hier_levels-1, 0)
+            
+            # NOTE: hotspot, bind the methods used in the loop to locals
+            is_cell_hidden = view.is_cell_hidden
+            iter_at_end = iter.at_end
+            iter_next = iter.next
+            iter_trans = iter.trans
+            iter_path = iter.path
+            iter_current_inst_element = iter.current_inst_element
+            
             i = 0
-            while not iter.at_end():
-                inst = iter.current_inst_element().inst()
-                hidden = self.view.is_cell_hidden(inst.cell.cell_index(), self.view.active_cellview_index)
+            while not iter_at_end():
+                inst = iter_current_inst_element().inst()
+                hidden = is_cell_hidden(inst.cell.cell_index(), active_cellview_index)
                 # # Hotspot, don't log this
                 # if Debugging.DEBUG:                
                 #     debug(f"inst from cell {inst.cell.name} hidden? {hidden}, "
                 #           f"trans={iter.trans() * iter.inst_trans()}, "
                 #           f"inst_bbox={inst.bbox()}")
                 if not hidden:
-                    inst_bbox_from_top = inst.bbox().transformed(iter.trans())
-                    edges = pya.Edges(inst_bbox_from_top)
-                    for e in edges:
-                        if e.clipped(search_box) is not None:
-                            consider_edge_selection(
-                                AlignToolSelection(location=location,
-                                                   search_box=search_box,
-                                                   edge=e,
-                                                   path=iter.path(),
-                                                   shape=inst_bbox_from_top,
-                                                   bbox_of_instance=inst,
-                                                   layer=None,
-                                                   snap_point=None)  # NOTE: snap point will be set later
-                            )
+                    inst_bbox_from_top = inst.bbox().transformed(iter_trans())
+                    path = iter_path()
+                    consider_box_edge_selections(box=inst_bbox_from_top,
+                                                 path=path,
+                                                 shape=inst_bbox_from_top,
+                                                 bbox_of_instance=inst)
                     midpoint = inst_bbox_from_top.center()
-                    midpoint_dummy_edge = pya.Edge(midpoint, midpoint)
-                    consider_edge_selection(
-                        AlignToolSelection(location=location,
-                                           search_box=search_box,
-                                           edge=midpoint_dummy_edge,
-                                           path=iter.path(),
-                                           shape=inst_bbox_from_top,
-                                           bbox_of_instance=inst,
-                                           layer=None,
-                                           snap_point=midpoint)
-                    )
-                iter.next()
+                    mx, my = midpoint.x, midpoint.y
+                    if box_left <= mx <= box_right and box_bottom <= my <= box_top:
+                        # NOTE: the degenerated midpoint edge is created on demand
+                        consider_edge_selection(mx, my, mx, my,
+                                                edge=None,
+                                                path=path,
+                                                shape=inst_bbox_from_top,
+                                                bbox_of_instance=inst,
+                                                layer=None,
+                                                snap_point=midpoint)
+                iter_next()
                 i += 1
                 if i >= iteration_limit:
                     break
         
         # for lyr, li in enumerate(self.layout.layer_infos()):
         ## NOTE: GUI levels 0 .. 0 means that only the TOP cell(s) are viewed from outside!
-        if self.view.max_hier_levels >= 1:
-            for lyr in visible_layer_indexes:
-                iter = top_cell.begin_shapes_rec_overlapping(lyr, search_box)
-                iter.min_depth = max(self.view.min_hier_levels-1, 0)
-                iter.max_depth = max(self.view.max_hier_levels-1, 0)
-                i = 0
-                while not iter.at_end():
-                    sh = iter.shape()
+        visible_layer_indexes = self.visible_layer_indexes() if walk_layout else []
+        if len(visible_layer_indexes) >= 1:
+            # NOTE: a single multi-layer iterator instead of one iterator per layer
+            iter = pya.RecursiveShapeIterator(cell_view.layout(), top_cell, visible_layer_indexes, 
+                                              search_box, True)  # overlapping
+            iter.min_depth = max(min_hier_levels-1, 0)
+            iter.max_depth = max(max_hier_levels-1, 0)
+            
+            # NOTE: hotspot, bind the methods used in the loop to locals
+            iter_at_end = iter.at_end
+            iter_next = iter.next
+            iter_itrans = iter.itrans
+            iter_path = iter.path
+            iter_shape = iter.shape
+            iter_layer = iter.layer
+            
+            # NOTE: each layer has its own iteration budget, 
+            #       so a dense layer can't starve the other layers
+            layer_budgets = dict.fromkeys(visible_layer_indexes, iteration_limit)
+            layers_left = len(layer_budgets)
+            while not iter_at_end():
+                lyr = iter_layer()
+                budget = layer_budgets[lyr]
+                if budget == 0:
+                    iter_next()
+                    continue
+                sh = iter_shape()
+                # # Hotspot, don't log this
+                # if Debugging.DEBUG:
+                #     debug(f"lyr {lyr}, found {sh}")
+                pg = sh.polygon
+                if pg is None:
                     # # Hotspot, don't log this
                     # if Debugging.DEBUG:
-                    #     debug(f"lyr {lyr} ({li}), found {sh}")
-                    pg = sh.polygon
-                    if pg is None:
-                        # # Hotspot, don't log this
-                        # if Debugging.DEBUG:
-                        #     debug(f"Skip shape {sh}, it's has no polygon")
-                        pass
+                    #     debug(f"Skip shape {sh}, it's has no polygon")
+                    pass
+                else:
+                    p = pg.transformed(iter_itrans())
+                    path = iter_path()
+                    if p.num_points() >= bulk_reject_min_points:
+                        if search_region is None:
+                            search_region = pya.Region(search_box)
+                        # NOTE: raw (unmerged) edges, exactly the ones of each_edge()
+                        polygon_edges = pya.Edges(p)
+                        polygon_edges.merged_semantics = False
+                        edges = polygon_edges.interacting(search_region).each()
                     else:
-                        p = sh.polygon.transformed(iter.itrans())
-                        for e in p.each_edge():
-                            consider_edge_selection(
-                                AlignToolSelection(location=location,
-                                                   search_box=search_box,
-                                                   edge=e,
-                                                   path=iter.path(),
-                                                   shape=sh,
-                                                   bbox_of_instance=None,
-                                                   layer=lyr,
-                                                   snap_point=None)  # NOTE: snap point will be set later
-                            )
-                        midpoint = p.bbox().center()
-                        midpoint_dummy_edge = pya.Edge(midpoint, midpoint)
-                        consider_edge_selection(
-                            AlignToolSelection(location=location,
-                                               search_box=search_box,
-                                               edge=midpoint_dummy_edge,
-                                               path=iter.path(),
-                                               shape=sh,
-                                               bbox_of_instance=None,
-                                               layer=None,
-                                               snap_point=midpoint)
-                        )
-                    
-                    iter.next()
-                    i += 1
-                    if i >= iteration_limit:
+                        edges = p.each_edge()
+                    for e in edges:
+                        consider_edge_selection(e.x1, e.y1, e.x2, e.y2,
+                                                edge=e,
+                                                path=path,
+                                                shape=sh,
+                                                bbox_of_instance=None,
+                                                layer=lyr,
+                                                snap_point=None)  # NOTE: snap point will be set later
+                    midpoint = p.bbox().center()
+                    mx, my = midpoint.x, midpoint.y
+                    if box_left <= mx <= box_right and box_bottom <= my <= box_top:
+                        # NOTE: the degenerated midpoint edge is created on demand
+                        consider_edge_selection(mx, my, mx, my,
+                                                edge=None,
+                                                path=path,
+                                                shape=sh,
+                                                bbox_of_instance=None,
+                                                layer=None,
+                                                snap_point=midpoint)
+                
+                iter_next()
+                layer_budgets[lyr] = budget - 1
+                if budget == 1:
+                    layers_left -= 1
+                    if layers_left == 0:
                         break
 
         if consider_rulers:
-            for a in self.view.each_annotation():
+            for a in view.each_annotation():
                 points: List[pya.Point] = []
-                edges: List[pya.Edge] = []
                 if a.outline == pya.Annotation.OutlineBox:
-                    box = a.box().to_itype(self.dbu)
-                    edges = pya.Polygon(box).each_edge()
+                    box = a.box().to_itype(dbu)
+                    consider_box_edge_selections(box=box,
+                                                 path=[],
+                                                 shape=None,
+                                                 bbox_of_instance=None)
                 else:
-                    points = [dp.to_itype(self.dbu) for dp in a.points]
-                for e in edges:
-                    clipped_edge = e.clipped(search_box)
-                    if clipped_edge:
-                        consider_edge_selection(
-                            AlignToolSelection(location=location,
-                                               search_box=search_box,
-                                               edge=e,
-                                               path=[],
-                                               shape=None,
-                                               bbox_of_instance=None,
-                                               layer=None,
-                                               snap_point=None)  # NOTE: snap point will be set later
-                        )
+                    points = [dp.to_itype(dbu) for dp in a.points]
                 for p in points:
                     if search_box.contains(p):
-                        e = pya.Edge(p, p)
-                        consider_edge_selection(
-                            AlignToolSelection(location=location,
-                                               search_box=search_box,
-                                               edge=e,
-                                               path=[],
-                                               shape=None,
-                                               bbox_of_instance=None,
-                                               layer=None,
-                                               snap_point=p)
-                        )
-
-        if nearest.edge is None:
+                        consider_edge_selection(p.x, p.y, p.x, p.y,
+                                                edge=None,
+                                                path=[],
+                                                shape=None,
+                                                bbox_of_instance=None,
+                                                layer=None,
+                                                snap_point=p)
+
+        if nearest is None:
             return None
         
-        nearest_point = self.find_nearest_edge_point(location=location, edge=nearest.edge)
+        edge, path, shape, bbox_of_instance, layer, snap_point = nearest
+        nearest_point = self.find_nearest_edge_point(location=location, edge=edge)
         if search_box.contains(nearest_point):
-            nearest.snap_point = nearest_point
-        return nearest
+            snap_point = nearest_point
+        return AlignToolSelection(location=location,
+                                  search_box=search_box,
+                                  edge=edge,
+                                  path=path,
+                                  shape=shape,
+                                  bbox_of_instance=bbox_of_instance,
+                                  layer=layer,
+                                  snap_point=snap_point)
     
     def viewport_adjust(self, v: int) -> int:
         trans = pya.CplxTrans(self.view.viewport_trans(), self.dbu)
@@ -539,76 +827,41 @@ class AlignToolPlugin(pya.Plugin):
     def max_distance(self) -> int:
         return self.viewport_adjust(20)
     
-    def preview_markers_for_selection(self, selection: AlignToolSelection) -> List[pya.Marker]:
-        markers = []
-    
-        edge_marker = pya.Marker(self.view)
-        edge_marker.line_style     = 0
-        edge_marker.line_width     = 2
-        edge_marker.vertex_size    = 0 
-        edge_marker.dither_pattern = 2
-        edge_marker.set(selection.edge.to_dtype(self.dbu))
-        markers += [edge_marker]
-        
-        if selection.snap_point is not None:
-            point_marker = pya.Marker(self.view)
-            point_marker.line_style     = 1
-            point_marker.line_width     = 2
-            point_marker.vertex_size    = 0
-            point_marker.dither_pattern = 0
-            d = self.viewport_adjust(5)
-            marker_box = pya.Box(pya.Point(selection.snap_point.x - d, selection.snap_point.y - d), 
-                                 pya.Point(selection.snap_point.x + d, selection.snap_point.y + d))
-            point_marker.set(marker_box.to_dtype(self.dbu))
-            markers += [point_marker]
-        
-        if self.search_box_marker_visible:
-            search_box_marker = pya.Marker(self.view)
-            search_box_marker.line_style = 2
-            search_box_marker.line_width = 1
-            search_box_marker.vertex_size = 0
-            search_box_marker.dither_pattern = -1
-            search_box_marker.set(selection.search_box.to_dtype(self.dbu))
-            markers += [search_box_marker]
-
-        return markers
-    
     def mouse_moved_event(self, dpoint: pya.DPoint, buttons: int, prio: bool):
         if prio:
             # # Hotspot, don't log this       
             # if Debugging.DEBUG:
             #     debug(f"mouse moved event, p={dpoint}, prio={prio}")
             
-            # only consider rulers to specify a destination
-            consider_rulers = self.state == AlignToolState.PENDING_SELECTION2
+            # NOTE: enum members are singletons, so identity checks are sufficient
+            mode = self._search_mode
+            if mode is None:  # AlignToolState.INACTIVE
+                return False
             
             selection = self.find_selection(location=dpoint, 
                                             max_distance=self.max_distance,
-                                            consider_rulers=consider_rulers)
+                                            mode=mode)
+            # NOTE: only show the tooltip if the hit state changes, 
+            #       there is no need to lay out the same text again on each mouse move event
+            tooltip_state = (mode, selection is not None)
+            tooltip_changed = tooltip_state != self._last_tooltip_state
+            self._last_tooltip_state = tooltip_state
+            
             if selection is None:
-                if self.state == AlignToolState.INACTIVE:
-                    return False
-                elif self.state == AlignToolState.PENDING_SELECTION1:
+                if not tooltip_changed:
+                    pass
+                elif mode is AlignToolSearchMode.SOURCE:
                     self.toolTip.showText(pya.QCursor.pos, "Select shape feature to align") 
-                elif self.state == AlignToolState.PENDING_SELECTION2:
-                    self.toolTip.showText(pya.QCursor.pos, "Select shape feature to reference") 
                 else:
-                    raise NotImplementedError(f"AlignToolState.matches: unknown type {self.state}")
-
+                    self.toolTip.showText(pya.QCursor.pos, "Select shape feature to reference") 
                 return False
             
-            if self.state == AlignToolState.INACTIVE:
-                return False
-            elif self.state == AlignToolState.PENDING_SELECTION1:
-                self._clear_markers_selection1()
-                self.markers_selection1 = self.preview_markers_for_selection(selection)
+            if mode is AlignToolSearchMode.SOURCE:
                 self.preview_selection1 = selection
-            elif self.state == AlignToolState.PENDING_SELECTION2:
-                self._clear_markers_selection2()
-                self.markers_selection2 = self.preview_markers_for_selection(selection)
-                self.preview_selection2 = selection
+                self._schedule_preview_markers_update(self.markers_selection1)
             else:
-                raise NotImplementedError(f"AlignToolState.matches: unknown type {self.state}")
+                self.preview_selection2 = selection
+                self._schedule_preview_markers_update(self.markers_selection2)
             
             return True
         return False
@@ -616,16 +869,17 @@ class AlignToolPlugin(pya.Plugin):
     def mouse_click_event(self, dpoint: pya.DPoint, buttons: int, prio: bool):
         if prio:
             if buttons in [8]:  # Left click
-                if self.state == AlignToolState.INACTIVE:
+                state = self._state
+                if state is AlignToolState.INACTIVE:
                     return False
                      
-                elif self.state == AlignToolState.PENDING_SELECTION1:
+                elif state is AlignToolState.PENDING_SELECTION1:
                     if self.preview_selection1 is None:
                         return False
                     self.selection1 = self.preview_selection1
                     self.state = AlignToolState.PENDING_SELECTION2
                     
-                elif self.state == AlignToolState.PENDING_SELECTION2:
+                elif state is AlignToolState.PENDING_SELECTION2:
                     if self.preview_selection2 is None:
                         return False
                 
@@ -645,7 +899,99 @@ class AlignToolPlugin(pya.Plugin):
             return True
         return False
         
+    def transform_objects(self, 
+                          transformees: Sequence[Union[pya.Instance, pya.Shape]], 
+                          trans: pya.Trans):
+        """
+        Transformees are grouped by their parent cell, 
+        shapes additionally by their container (layer).
+        If all shapes and instances of a cell are to be transformed,
+        the cell is transformed with a single call,
+        otherwise if all shapes of a container are to be transformed, 
+        the container is transformed with a single call.
+        
+        Instances listed more than once (e.g. several pre-selected shapes 
+        within the same instance) are transformed only once.
+        Transformees within a cell instantiated by another transformed instance,
+        e.g. a child instance selected together with its parent instance,
+        are skipped, they already move along with the parent.
+        
+        NOTE: shapes are not converted into a pya.Region for bulk transformation,
+              as this would turn boxes, paths and texts into polygons.
+              For the same reason, the point coordinates are not translated in Python
+              and reassembled into polygons, Shape.transform already does this in C++.
+        """
+        # NOTE: the layout is kept in the group, 
+        #       so its id can't be reused while grouping
+        #       (layout, cell, shapes by layer, instances by (cell index, trans))
+        cell_groups: Dict[Tuple[int, int], Tuple[pya.Layout, 
+                                                 pya.Cell, 
+                                                 Dict[int, List[pya.Shape]], 
+                                                 Dict[Tuple[int, str], List[pya.Instance]]]] = {}
+        for t in transformees:
+            is_shape = isinstance(t, pya.Shape)
+            cell = t.cell if is_shape else t.parent_cell
+            layout = cell.layout()
+            key = (id(layout), cell.cell_index())
+            group = cell_groups.get(key)
+            if group is None:
+                group = (layout, cell, {}, {})
+                cell_groups[key] = group
+            
+            if is_shape:
+                group[2].setdefault(t.layer, []).append(t)
+            else:
+                # NOTE: the instance == check is only done within the small bucket 
+                #       of instances of the same cell with the same transformation
+                bucket = group[3].setdefault((t.cell_index, t.cplx_trans.to_s()), [])
+                if not any(t == other for other in bucket):
+                    bucket.append(t)
+        
+        # cell indexes below the transformed instances, by id(layout)
+        covered_cells: Dict[int, Set[int]] = {}
+        for layout, cell, shapes_by_layer, instance_buckets in cell_groups.values():
+            covered = covered_cells.setdefault(id(layout), set())
+            for cell_index, trans_str in instance_buckets.keys():
+                if cell_index not in covered:
+                    covered.add(cell_index)
+                    covered.update(layout.cell(cell_index).called_cells())
+        
+        for layout, cell, shapes_by_layer, instance_buckets in cell_groups.values():
+            if cell.cell_index() in covered_cells[id(layout)]:
+                continue
+            
+            num_shapes = sum(len(shapes) for shapes in shapes_by_layer.values())
+            num_instances = sum(len(bucket) for bucket in instance_buckets.values())
+            if num_instances == cell.child_instances():
+                # NOTE: Cell.transform moves the shapes on all layers, 
+                #       including special layers (e.g. PCell guiding shapes), 
+                #       which are not listed by Layout.layer_indexes()
+                all_layers = (li for li in range(layout.layers()) if layout.is_valid_layer(li))
+                if num_shapes == sum(cell.shapes(li).size() for li in all_layers):
+                    cell.transform(trans)
+                    continue
+            
+            for layer, shapes in shapes_by_layer.items():
+                container = cell.shapes(layer)
+                if len(shapes) == container.size():
+                    container.transform(trans)
+                else:
+                    for sh in shapes:
+                        sh.transform(trans)
+            
+            for bucket in instance_buckets.values():
+                for inst in bucket:
+                    inst.transform(trans)
+        
     def commit_align(self, selection1: AlignToolSelection, selection2: AlignToolSelection):
+        # NOTE: single exit, the tool is deactivated exactly once, 
+        #       whether the alignment was applied, rejected or failed
+        try:
+            self.apply_align(selection1, selection2)
+        finally:
+            self.deactivate()
+    
+    def apply_align(self, selection1: AlignToolSelection, selection2: AlignToolSelection):
         # NOTE:
         #      Point1 -> Point2: X/Z movement
         #      Point1 -> Edge2: TODO???
@@ -657,8 +1003,33 @@ class AlignToolPlugin(pya.Plugin):
         is_point2 = selection2.snap_point is not None
         is_edge2 = not is_point2
 
+        # NOTE: reject the unsupported case of non-parallel edges (cross product) first,
+        #       before anything else is prepared
+        if is_edge1 and is_edge2:
+            edge1 = selection1.edge
+            edge2 = selection2.edge
+            if edge1.dx() * edge2.dy() - edge1.dy() * edge2.dx() != 0:
+                # NOTE: status bar message instead of a modal dialog, which would block the UI
+                pya.MainWindow.instance().message("Unsupported use case: "
+                                                  "Aligning non-parallel edges is not yet supported.", 
+                                                  2000)
+                return
+
         dx = 0
         dy = 0
+
+        if is_point1 and is_point2:
+            dx = selection2.snap_point.x - selection1.snap_point.x
+            dy = selection2.snap_point.y - selection1.snap_point.y
+        elif is_point1 and is_edge2:
+            edge2 = selection2.edge
+            dx, dy = edge_align_handler(edge2)(selection1.snap_point, edge2.p1)
+        elif is_edge1 and is_point2:
+            edge1 = selection1.edge
+            dx, dy = edge_align_handler(edge1)(edge1.p1, selection2.snap_point)
+        elif is_edge1 and is_edge2:  # parallel, see above
+            dx, dy = edge_align_handler(edge1)(edge1.p1, edge2.p1)
+
         transformees = []
 
         if len(self.pre_selected_objects) >= 1:  # user had a preselection of one or multiple objects
@@ -672,61 +1043,32 @@ class AlignToolPlugin(pya.Plugin):
         elif len(selection1.path) >= 1:  # an instance has to be aligned
             transformees = [selection1.path[0].inst()]
 
-        if is_point1 and is_point2:
-            dx = selection2.snap_point.x - selection1.snap_point.x
-            dy = selection2.snap_point.y - selection1.snap_point.y
-        elif is_point1 and is_edge2:
-            edge2 = selection2.edge
-            is_horizontal = edge2.dy() == 0
-            is_vertical = edge2.dx() == 0
-            if is_horizontal:
-                dx = 0
-                dy = edge2.p1.y - selection1.snap_point.y
-            elif is_vertical:
-                dx = edge2.p1.x - selection1.snap_point.x
-                dy = 0
-        elif is_edge1 and is_point2:
-            edge1 = selection1.edge
-            is_horizontal = edge1.dy() == 0
-            is_vertical = edge1.dx() == 0
-            if is_horizontal:
-                dx = 0
-                dy = selection2.snap_point.y - edge1.p1.y
-            elif is_vertical:
-                dx = selection2.snap_point.x - edge1.p1.x
-                dy = 0
-        elif is_edge1 and is_edge2:
-            edge1 = selection1.edge
-            edge2 = selection2.edge
-            if edge1.is_parallel(edge2):
-                is_horizontal = edge1.dy() == 0
-                is_vertical = edge1.dx() == 0
-                if is_horizontal:
-                    dx = 0
-                    dy = edge2.p1.y - edge1.p1.y
-                elif is_vertical:
-                    dx = edge2.p1.x - edge1.p1.x
-                    dy = 0
-            else:
-                pya.QMessageBox.warning(self.view.widget(), "Unsupported use case", 
-                                        "Aligning non-parallel edges is not yet supported.")
-                self.deactivate()
-                return
-
+        transformees = tuple(transformees)
+        if len(transformees) == 0:  # nothing to align
+            return
 
         # snap to technical minimum grid (avoid DRC offgrid errors)
-        grid_dbu = int(drc_tech_grid_um() / self.dbu)        
-        snapped_dx = round(dx / grid_dbu) * grid_dbu
-        snapped_dy = round(dy / grid_dbu) * grid_dbu
+        grid_dbu = self.grid_dbu
+        # NOTE: edge alignments move along one axis only, the other delta is 0 and stays 0
+        snapped_dx = snap_to_grid(dx, grid_dbu) if dx != 0 else 0
+        snapped_dy = snap_to_grid(dy, grid_dbu) if dy != 0 else 0
+        
+        if snapped_dx == 0 and snapped_dy == 0:  # already aligned, nothing to do
+            if Debugging.DEBUG:
+                debug("AlignToolPlugin.apply_align, already aligned")
+            return
+        
+        # NOTE: the transformation is created once, and shared by all transformees.
+        #       It is a pure displacement, a simple (integer, non-complex) pya.Trans 
+        #       with rotation code r0, so no matrix arithmetic is involved when applying it
+        displacement = pya.Vector(snapped_dx, snapped_dy)
+        trans = pya.Trans(displacement)
         
         self.view.transaction("align")
         try:
-            trans = pya.Trans(snapped_dx, snapped_dy)
-            for t in transformees:
-                t.transform(trans)
+            self.transform_objects(transformees, trans)
         finally:
             self.view.commit()
-            self.deactivate()
 
 
 class AlignToolPluginFactory(pya.PluginFactory):